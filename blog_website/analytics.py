@@ -0,0 +1,225 @@
+# -------------------------------------------------------------
+# PAGE-VIEW ANALYTICS
+# -------------------------------------------------------------
+# view_post only bumps in-memory counters. A background thread per worker
+# flushes the deltas every FLUSH_SECONDS (and once more at shutdown) with
+# one record_page_views() RPC, so a page view never costs a DB write.
+# Unique visitors are estimated with HyperLogLog sketches that can be
+# merged across workers and days.
+import atexit
+import hashlib
+import math
+import os
+import socket
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+from db import fetch_all
+
+FLUSH_SECONDS = int(os.environ.get("PAGE_VIEW_FLUSH_SECONDS", "60"))
+TRACK_UNIQUES = os.environ.get("PAGE_VIEW_UNIQUES", "1") == "1"
+HLL_PRECISION = 10  # 1024 registers, ~3% standard error
+
+
+class HyperLogLog:
+    """Fixed-size distinct-count sketch; merge() is a register-wise max"""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+        index = h >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = h & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        for i, r in enumerate(other.registers):
+            if r > self.registers[i]:
+                self.registers[i] = r
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_hex(self):
+        return self.registers.hex()
+
+    @classmethod
+    def from_hex(cls, value, precision=HLL_PRECISION):
+        return cls(precision, bytes.fromhex(value))
+
+
+class ViewCounter:
+    """Per-worker view aggregation with periodic batched flushes"""
+
+    def __init__(self, flush_seconds=FLUSH_SECONDS, track_uniques=TRACK_UNIQUES):
+        self.flush_seconds = flush_seconds
+        self.track_uniques = track_uniques
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lock = threading.Lock()
+        self.post_views = Counter()      # (post_id, day) -> views
+        self.category_views = Counter()  # (category, day) -> views
+        self.sketches = {}               # (scope, day) -> HyperLogLog
+        self.dirty_sketches = set()
+        self.client = None
+        self.started_pid = None
+        self.stop_event = threading.Event()
+
+    def attach(self, client):
+        """Remember the client; the flush thread starts lazily per process"""
+        self.client = client
+
+    def _ensure_thread(self):
+        # Started on first use rather than at import so each forked gunicorn
+        # worker gets its own thread (threads do not survive fork).
+        if self.started_pid == os.getpid() or not self.client:
+            return
+        self.started_pid = os.getpid()
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        threading.Thread(target=self._run, name="page-view-flush", daemon=True).start()
+        atexit.register(self.flush)
+
+    def record(self, post_id, category, visitor=None):
+        """Count one view; never touches the database"""
+        day = date.today().isoformat()
+        with self.lock:
+            self._ensure_thread()
+            self.post_views[(post_id, day)] += 1
+            self.category_views[(category, day)] += 1
+            if self.track_uniques and visitor is not None:
+                for scope in ("site", f"post:{post_id}", f"category:{category}"):
+                    key = (scope, day)
+                    if key not in self.sketches:
+                        self.sketches[key] = HyperLogLog()
+                    self.sketches[key].add(visitor)
+                    self.dirty_sketches.add(key)
+
+    def _run(self):
+        while not self.stop_event.wait(self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        """Send buffered deltas; on failure they are put back for next time"""
+        if not self.client:
+            return
+        with self.lock:
+            post_views, self.post_views = self.post_views, Counter()
+            category_views, self.category_views = self.category_views, Counter()
+            dirty, self.dirty_sketches = self.dirty_sketches, set()
+            sketch_rows = [
+                {
+                    "scope": scope,
+                    "day": day,
+                    "worker_id": self.worker_id,
+                    "registers": self.sketches[(scope, day)].to_hex(),
+                    "updated_at": datetime.utcnow().isoformat(),
+                }
+                for scope, day in dirty
+            ]
+            # Older days are final once their last change has been flushed
+            today = date.today().isoformat()
+            for key in [k for k in self.sketches if k[1] < today and k not in dirty]:
+                del self.sketches[key]
+
+        if not post_views and not sketch_rows:
+            return
+
+        views_sent = False
+        try:
+            if post_views:
+                self.client.rpc("record_page_views", {
+                    "post_rows": [
+                        {"post_id": post_id, "day": day, "views": views}
+                        for (post_id, day), views in post_views.items()
+                    ],
+                    "category_rows": [
+                        {"category": category, "day": day, "views": views}
+                        for (category, day), views in category_views.items()
+                    ],
+                }).execute()
+            views_sent = True
+            if sketch_rows:
+                self.client.table("visitor_sketches").upsert(sketch_rows).execute()
+            print(f"✅ Flushed {sum(post_views.values())} page views ({len(sketch_rows)} sketches)")
+        except Exception as e:
+            print(f"❌ Page view flush error: {e}")
+            with self.lock:
+                # Whatever was not written goes back into the buffer
+                if not views_sent:
+                    self.post_views.update(post_views)
+                    self.category_views.update(category_views)
+                self.dirty_sketches.update((row["scope"], row["day"]) for row in sketch_rows)
+
+
+view_counter = ViewCounter()
+
+
+def _merged_uniques(rows):
+    sketches = {}
+    for row in rows:
+        hll = HyperLogLog.from_hex(row["registers"])
+        if row["scope"] in sketches:
+            sketches[row["scope"]].merge(hll)
+        else:
+            sketches[row["scope"]] = hll
+    return {scope: hll.count() for scope, hll in sketches.items()}
+
+
+def load_dashboard_stats(client, days=14, top=5):
+    """Daily series plus top posts/categories from the rollup tables only"""
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+
+    # Summed by page_view_stats() in the database: one small JSON result
+    # however many posts and days there are.
+    totals = client.rpc("page_view_stats", {"since": since, "top_n": top}).execute().data or {}
+    by_day = {row["day"]: row["views"] for row in totals.get("series") or []}
+    top_posts = [(row["post_id"], row["views"]) for row in totals.get("top_posts") or []]
+    top_categories = [(row["category"], row["views"]) for row in totals.get("top_categories") or []]
+
+    series = []
+    for offset in range(days):
+        day = (date.today() - timedelta(days=days - 1 - offset)).isoformat()
+        series.append({"day": day, "views": by_day.get(day, 0)})
+
+    uniques = defaultdict(lambda: None)
+    if TRACK_UNIQUES:
+        scopes = ["site"] + [f"post:{post_id}" for post_id, _ in top_posts] + [f"category:{c}" for c, _ in top_categories]
+        # One row per scope, day and worker, so page past the row cap
+        sketch_rows = fetch_all(
+            lambda: client.table("visitor_sketches")
+            .select("scope, registers")
+            .in_("scope", scopes)
+            .gte("day", since)
+            .order("scope").order("day").order("worker_id")
+        )
+        uniques.update(_merged_uniques(sketch_rows))
+
+    return {
+        "days": days,
+        "series": series,
+        "peak": max((point["views"] for point in series), default=0),
+        "total_views": sum(by_day.values()),
+        "unique_visitors": uniques["site"],
+        "top_posts": [
+            {"post_id": post_id, "views": views, "uniques": uniques[f"post:{post_id}"]}
+            for post_id, views in top_posts
+        ],
+        "top_categories": [
+            {"category": category, "views": views, "uniques": uniques[f"category:{category}"]}
+            for category, views in top_categories
+        ],
+    }
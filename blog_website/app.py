@@ -15,7 +15,13 @@ from flask import (
 from supabase import create_client
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from derived import make_excerpt
+from related_posts import refresh_relations, schedule_refresh
+from analytics import view_counter, load_dashboard_stats
+import feeds
+import profiling
 import os, uuid, html
+import click
 from datetime import datetime
 
 # -------------------------------------------------------------
@@ -28,6 +34,13 @@ app.config["UPLOAD_FOLDER"] = "static/uploads"
 app.config["ALLOWED_EXTENSIONS"] = {"png", "jpg", "jpeg", "gif"}
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
+profiling.init_app(app)
+
+# Listing cards only need the excerpt, not the full post body
+LISTING_COLUMNS = "id, title, excerpt, category, image_path, author_id, created_at, users(username)"
+
+CATEGORIES = ["AboutMe", "Esoteric Science", "Science and Tech", "Indian Culture", "Spiritual"]
+
 # -------------------------------------------------------------
 # SUPABASE CONFIG - SIMPLIFIED (USE ONLY SERVICE KEY)
 # -------------------------------------------------------------
@@ -54,6 +67,8 @@ else:
 
 # Use same client for admin operations
 supabase_admin = supabase
+if supabase:
+    view_counter.attach(supabase)
 STORAGE_BUCKET = "blog-images"
 
 # -------------------------------------------------------------
@@ -110,8 +125,15 @@ def get_unread_count():
     """Get unread message count for the template"""
     try:
         if session.get("is_admin") and supabase:
-            messages = supabase.table("messages").select("*").execute().data
-            return sum(1 for m in messages if not m["is_read"])
+            # Count server-side so the partial unread index does the work
+            response = (
+                supabase.table("messages")
+                .select("id", count="exact")
+                .eq("is_read", False)
+                .limit(1)
+                .execute()
+            )
+            return response.count or 0
         return 0
     except Exception as e:
         print(f"❌ Error getting unread count: {e}")
@@ -128,6 +150,11 @@ def get_image_url(image_path):
     # For now, just return the path as is
     return image_path
 
+def on_post_changed(post_id, *categories):
+    """Refresh everything precomputed from posts after a write"""
+    schedule_refresh(supabase, [post_id])
+    feeds.schedule_rebuild(supabase, categories, CATEGORIES)
+
 @app.context_processor
 def inject_utils():
     """Inject variables into all templates - FIXED with get_image_url"""
@@ -154,7 +181,7 @@ def index():
         print("🔄 Loading posts for index page...")
         
         # Get posts with users information
-        response = supabase.table("posts").select("*, users(username)").order("created_at", desc=True).limit(6).execute()
+        response = supabase.table("posts").select(LISTING_COLUMNS).order("created_at", desc=True).limit(6).execute()
         
         if not response.data:
             print("ℹ️ No posts found in database")
@@ -310,8 +337,17 @@ def view_post(id):
 
         post = response.data[0]
         print(f"✅ Loaded post: {post['title']}")
-        
-        return render_template("post.html", post=post)
+        view_counter.record(post["id"], post["category"], visitor=f"user:{session['user_id']}")
+
+        # Precomputed by related_posts.py; a missing row just hides the section
+        relations = None
+        try:
+            rel_response = supabase.table("post_relations").select("*").eq("post_id", id).execute()
+            relations = rel_response.data[0] if rel_response.data else None
+        except Exception as e:
+            print(f"❌ Related posts lookup error: {e}")
+
+        return render_template("post.html", post=post, relations=relations)
         
     except Exception as e:
         print(f"❌ View post error: {str(e)}")
@@ -327,7 +363,7 @@ def view_category(category):
         
         print(f"🔄 Loading posts for category: {category}")
         
-        response = supabase.table("posts").select("*, users(username)").eq("category", category).order("created_at", desc=True).execute()
+        response = supabase.table("posts").select(LISTING_COLUMNS).eq("category", category).order("created_at", desc=True).execute()
         
         posts = response.data if response.data else []
         print(f"✅ Loaded {len(posts)} posts for category: {category}")
@@ -338,6 +374,41 @@ def view_category(category):
         print(f"❌ Category error: {str(e)}")
         return render_template("categories.html", posts=[], category=category, error="Error loading posts")
 
+# -------------------------------------------------------------
+# FEEDS & SITEMAP (PRE-RENDERED BY feeds.py)
+# -------------------------------------------------------------
+def serve_feed(key, mimetype, categories=()):
+    if not feeds.SITE_URL:
+        # Links must never come from the request's Host header
+        return "Feeds are not configured (SITE_URL is not set)", 503
+    response = feeds.feed_response(key, mimetype)
+    if response is None and supabase:
+        # First request after a deploy: build once, then it's a static blob
+        try:
+            feeds.build_feeds(supabase, categories, CATEGORIES)
+        except Exception as e:
+            print(f"❌ Feed build error: {e}")
+        response = feeds.feed_response(key, mimetype)
+    return response or ("Feed unavailable", 503)
+
+@app.route("/feed.xml")
+def rss_feed():
+    return serve_feed("feed", "application/rss+xml")
+
+@app.route("/atom.xml")
+def atom_feed():
+    return serve_feed("atom", "application/atom+xml")
+
+@app.route("/category/<category>/feed.xml")
+def category_feed(category):
+    if category not in CATEGORIES:
+        return not_found_error(None)
+    return serve_feed(feeds.category_key(category), "application/rss+xml", [category])
+
+@app.route("/sitemap.xml")
+def sitemap():
+    return serve_feed("sitemap", "application/xml")
+
 # -------------------------------------------------------------
 # CONTACT MESSAGE
 # -------------------------------------------------------------
@@ -499,24 +570,33 @@ def admin_dashboard():
         posts = posts_response.data if posts_response.data else []
         total_posts = len(posts)
 
-        messages_response = supabase.table("messages").select("*").execute()
-        messages = messages_response.data if messages_response.data else []
-        total_messages = len(messages)
-        unread_messages = sum(1 for m in messages if not m["is_read"])
+        # Counted server-side; the rows themselves are never needed here
+        messages_response = supabase.table("messages").select("id", count="exact").limit(1).execute()
+        total_messages = messages_response.count or 0
+        unread_messages = get_unread_count()
 
-        users_response = supabase.table("users").select("*").execute()
-        users = users_response.data if users_response.data else []
-        total_users = len(users)
+        users_response = supabase.table("users").select("id", count="exact").limit(1).execute()
+        total_users = users_response.count or 0
 
         print(f"✅ Admin dashboard loaded: {total_posts} posts, {total_messages} messages, {total_users} users")
 
+        view_stats = None
+        try:
+            view_stats = load_dashboard_stats(supabase)
+            titles = {p["id"]: p["title"] for p in posts}
+            for entry in view_stats["top_posts"]:
+                entry["title"] = titles.get(entry["post_id"], f"Post #{entry['post_id']}")
+        except Exception as e:
+            print(f"❌ Page view stats error: {e}")
+
         return render_template(
             "admin_dashboard.html",
             posts=posts,
             total_posts=total_posts,
             total_messages=total_messages,
             unread_messages=unread_messages,
-            total_users=total_users
+            total_users=total_users,
+            view_stats=view_stats
         )
     except Exception as e:
         print(f"❌ Admin dashboard error: {e}")
@@ -529,7 +609,7 @@ def admin_dashboard():
 @app.route("/admin/create-post", methods=["GET", "POST"])
 @admin_required
 def create_post():
-    categories = ["AboutMe", "Esoteric Science", "Science and Tech", "Indian Culture", "Spiritual"]
+    categories = CATEGORIES
 
     if request.method == "POST":
         data = request.form
@@ -545,6 +625,7 @@ def create_post():
             result = supabase.table("posts").insert({
                 "title": data["title"],
                 "content": html.escape(data["content"]),
+                "excerpt": make_excerpt(html.escape(data["content"])),
                 "category": data["category"],
                 "image_path": img_url,
                 "author_id": session["user_id"],
@@ -552,6 +633,7 @@ def create_post():
             }).execute()
 
             if result.data:
+                on_post_changed(result.data[0]["id"], data["category"])
                 flash("Post created successfully!", "success")
                 return redirect(url_for("admin_dashboard"))
             else:
@@ -570,7 +652,7 @@ def create_post():
 @app.route("/admin/edit-post/<int:id>", methods=["GET", "POST"])
 @admin_required
 def edit_post(id):
-    categories = ["AboutMe", "Esoteric Science", "Science and Tech", "Indian Culture", "Spiritual"]
+    categories = CATEGORIES
 
     try:
         if not supabase:
@@ -603,11 +685,13 @@ def edit_post(id):
             update_data = {
                 "title": data["title"],
                 "content": html.escape(data["content"]),
+                "excerpt": make_excerpt(html.escape(data["content"])),
                 "category": data["category"],
                 "image_path": img_url
             }
             
             supabase.table("posts").update(update_data).eq("id", id).execute()
+            on_post_changed(id, post["category"], data["category"])
             flash("Post updated successfully!", "success")
             return redirect(url_for("admin_dashboard"))
 
@@ -629,7 +713,8 @@ def delete_post(id):
             flash("Database connection error.", "error")
             return redirect(url_for("admin_dashboard"))
         
-        supabase.table("posts").delete().eq("id", id).execute()
+        deleted = supabase.table("posts").delete().eq("id", id).execute()
+        on_post_changed(id, *[p["category"] for p in deleted.data or []])
         flash("Post deleted successfully!", "success")
     except Exception as e:
         print(f"❌ Delete post error: {e}")
@@ -667,6 +752,57 @@ def delete_message(id):
         flash("Error deleting message.", "error")
     return redirect(url_for("admin_messages"))
 
+# -------------------------------------------------------------
+# ADMIN — REQUEST PROFILES
+# -------------------------------------------------------------
+@app.route("/admin/profiles")
+@admin_required
+def admin_profiles():
+    return render_template(
+        "profiles.html",
+        profiles=profiling.list_profiles(),
+        profile=None,
+        enabled_until=profiling.enabled_until(),
+        sample_rate=profiling.PROFILE_SAMPLE_RATE,
+        max_files=profiling.PROFILE_MAX_FILES
+    )
+
+@app.route("/admin/profiles/<profile_id>")
+@admin_required
+def admin_profile(profile_id):
+    profile = profiling.load_profile(profile_id)
+    if not profile:
+        flash("Profile not found (it may have rotated out).", "error")
+        return redirect(url_for("admin_profiles"))
+    return render_template(
+        "profiles.html",
+        profiles=[],
+        profile=profile,
+        enabled_until=profiling.enabled_until(),
+        sample_rate=profiling.PROFILE_SAMPLE_RATE,
+        max_files=profiling.PROFILE_MAX_FILES
+    )
+
+@app.route("/admin/profiles/<profile_id>/download")
+@admin_required
+def download_profile(profile_id):
+    if not profiling.load_profile(profile_id):
+        flash("Profile not found (it may have rotated out).", "error")
+        return redirect(url_for("admin_profiles"))
+    return send_from_directory(profiling.PROFILE_DIR, f"{profile_id}.prof", as_attachment=True)
+
+@app.route("/admin/profiles/toggle", methods=["POST"])
+@admin_required
+def toggle_profiling():
+    # Read the file itself; is_enabled() may be a few seconds stale
+    enabled = profiling.enabled_until() is None
+    profiling.set_enabled(enabled)
+    if enabled:
+        flash(f"Profiling every request for the next {profiling.PROFILE_TOGGLE_MINUTES} minutes.", "success")
+    else:
+        flash("Profiling toggle turned off.", "success")
+    return redirect(url_for("admin_profiles"))
+
 # -------------------------------------------------------------
 # STATIC FILE ROUTES - FIXED
 # -------------------------------------------------------------
@@ -737,6 +873,95 @@ def internal_error(error):
     </html>
     ''', 500
 
+# -------------------------------------------------------------
+# CLI — DATABASE TOOLING
+# -------------------------------------------------------------
+@app.cli.group("db")
+def db_cli():
+    """Versioned schema migrations and backfills"""
+
+BACKEND_OPTION = click.option("--backend", type=click.Choice(["sqlite", "postgres"]), default="sqlite")
+
+@db_cli.command("status")
+@BACKEND_OPTION
+def db_status_command(backend):
+    """List migrations and whether they are applied"""
+    from migrate import status
+
+    for version, name, applied in status(backend):
+        print(f"{'✅' if applied else '⏳'} {version}_{name}")
+
+@db_cli.command("upgrade")
+@BACKEND_OPTION
+@click.option("--to", "target", default=None, help="Stop after this version")
+def db_upgrade_command(backend, target):
+    """Apply pending forward scripts"""
+    from migrate import upgrade
+
+    applied = upgrade(backend, target)
+    print(f"✅ {len(applied)} migration(s) applied" if applied else "✅ Already up to date")
+
+@db_cli.command("downgrade")
+@BACKEND_OPTION
+@click.option("--to", "target", default=None, help="Revert everything newer than this version (default: latest only)")
+def db_downgrade_command(backend, target):
+    """Run backward scripts"""
+    from migrate import downgrade
+
+    reverted = downgrade(backend, target)
+    print(f"✅ {len(reverted)} migration(s) reverted")
+
+@db_cli.command("backfill")
+@BACKEND_OPTION
+@click.argument("name")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--max-duty", default=0.5, show_default=True, help="Share of wall time spent writing (0-1]")
+@click.option("--restart", is_flag=True, help="Forget saved progress and start from the first row")
+def db_backfill_command(backend, name, batch_size, max_duty, restart):
+    """Fill a derived column for existing rows, resumably"""
+    from migrate import BACKFILLS, run_backfill
+
+    if name not in BACKFILLS:
+        raise click.BadParameter(f"choose from: {', '.join(BACKFILLS)}", param_hint="NAME")
+    run_backfill(backend, name, batch_size=batch_size, max_duty=max_duty, restart=restart)
+
+@app.cli.command("rebuild-related")
+def rebuild_related_command():
+    """Recompute related posts and prev/next links for every post"""
+    if not supabase:
+        raise click.ClickException("Supabase is not configured")
+    changed = refresh_relations(supabase)
+    print(f"✅ Related posts rebuilt ({changed} rows updated)")
+
+@app.cli.command("explain-queries")
+@click.option("--backend", type=click.Choice(["sqlite", "postgres"]), default="sqlite")
+@click.option("--verbose", is_flag=True, help="Print every plan, not just the flagged ones")
+def explain_queries_command(backend, verbose):
+    """EXPLAIN every data-layer query and flag full scans / unindexed sorts"""
+    from query_advisor import explain_queries
+
+    report = explain_queries(backend)
+    flagged = 0
+    for entry in report:
+        if entry["expected"]:
+            print(f"⚠️ {entry['name']} ({entry['route']}) - expected: {entry['expected']}")
+            for problem in entry["problems"]:
+                print(f"     {problem}")
+        elif entry["problems"]:
+            flagged += 1
+            print(f"❌ {entry['name']} ({entry['route']})")
+            for problem in entry["problems"]:
+                print(f"     {problem}")
+        else:
+            print(f"✅ {entry['name']} ({entry['route']})")
+        if verbose or (entry["problems"] and not entry["expected"]):
+            for line in entry["plan"]:
+                print(f"       | {line}")
+
+    print(f"📋 {len(report)} queries checked, {flagged} flagged")
+    if flagged:
+        raise SystemExit(1)
+
 # -------------------------------------------------------------
 # RUN SERVER
 # -------------------------------------------------------------
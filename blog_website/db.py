@@ -0,0 +1,113 @@
+# -------------------------------------------------------------
+# DIRECT SQL CONNECTIONS + SUPABASE PAGINATION
+# -------------------------------------------------------------
+# The web app talks to Supabase through the REST client. Schema work
+# (indexes, EXPLAIN) needs a real SQL connection instead, so these helpers
+# open one for either the local SQLite copy or the Supabase Postgres DB.
+# fetch_all() is for background jobs that need every row over REST.
+import os
+import re
+import sqlite3
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKENDS = ("sqlite", "postgres")
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(BASE_DIR, "blog.db"))
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+
+def connect(backend, autocommit=True):
+    """Open a DB-API connection for the given backend"""
+    if backend == "sqlite":
+        return sqlite3.connect(SQLITE_PATH)
+
+    if backend == "postgres":
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL is not set (use the Supabase direct connection string)")
+        try:
+            import psycopg2
+        except ImportError:
+            raise RuntimeError("psycopg2 is required for the postgres backend: pip install psycopg2-binary")
+        conn = psycopg2.connect(DATABASE_URL)
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        conn.autocommit = autocommit
+        return conn
+
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def sql_for(backend, sql):
+    """Queries are written with sqlite '?' placeholders; psycopg2 wants '%s'"""
+    if backend == "postgres":
+        return sql.replace("?", "%s")
+    return sql
+
+
+def fetch_all(build_query, page_size=1000):
+    """
+    Read every row of a Supabase query. PostgREST caps a response at 1,000
+    rows by default, so page with .range(); build_query must return a fresh
+    query with a stable .order() on each call.
+    """
+    rows = []
+    start = 0
+    while True:
+        page = build_query().range(start, start + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+DOLLAR_TAG_RE = re.compile(r"\$[A-Za-z_]*\$")
+
+
+def split_statements(script):
+    """
+    Split a .sql file into single statements. Comments are dropped, and a
+    ';' only ends a statement outside comments, '...' / "..." quotes and
+    $tag$-quoted bodies.
+    """
+    statements = []
+    current = []
+    i = 0
+    n = len(script)
+    while i < n:
+        ch = script[i]
+        if script.startswith("--", i):
+            end = script.find("\n", i)
+            i = n if end == -1 else end
+        elif script.startswith("/*", i):
+            end = script.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            current.append(" ")
+        elif ch in ("'", '"'):
+            # A doubled quote inside the literal is an escaped quote
+            end = i + 1
+            while True:
+                end = script.find(ch, end)
+                if end == -1:
+                    end = n
+                    break
+                if script.startswith(ch * 2, end):
+                    end += 2
+                    continue
+                end += 1
+                break
+            current.append(script[i:end])
+            i = end
+        elif ch == "$" and DOLLAR_TAG_RE.match(script, i):
+            tag = DOLLAR_TAG_RE.match(script, i).group()
+            end = script.find(tag, i + len(tag))
+            end = n if end == -1 else end + len(tag)
+            current.append(script[i:end])
+            i = end
+        elif ch == ";":
+            statements.append("".join(current))
+            current = []
+            i += 1
+        else:
+            current.append(ch)
+            i += 1
+    statements.append("".join(current))
+    return [s.strip() for s in statements if s.strip()]
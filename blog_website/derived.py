@@ -0,0 +1,29 @@
+# -------------------------------------------------------------
+# DERIVED POST COLUMNS
+# -------------------------------------------------------------
+# Computed from a post's own fields. app.py fills them in on create/edit;
+# migrate.py backfills them for rows written before the column existed.
+import html
+import re
+
+EXCERPT_LENGTH = 200
+
+TAG_RE = re.compile(r"<[^>]+>")
+SPACE_RE = re.compile(r"\s+")
+
+
+def plain_text(content):
+    """Stored content (escaped, may hold tags) as one line of plain text"""
+    if not content:
+        return ""
+    text = html.unescape(content)
+    text = TAG_RE.sub(" ", text)
+    return SPACE_RE.sub(" ", text).strip()
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """Plain-text teaser cut on a word boundary (content is stored escaped)"""
+    text = plain_text(content)
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(" ", 1)[0] + "..."
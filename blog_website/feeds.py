@@ -0,0 +1,294 @@
+# -------------------------------------------------------------
+# RSS / ATOM FEEDS AND SITEMAP
+# -------------------------------------------------------------
+# Feeds are rendered ahead of time from post metadata and stored in
+# FEED_CACHE_DIR as <name>.xml and <name>.xml.gz, shared by every gunicorn
+# worker. Each file starts with one JSON line holding that variant's own
+# ETag and Last-Modified, so a request reads headers and body from a single
+# atomically replaced file. Requests only read a blob; after create/edit/delete a background rebuild re-renders the main
+# feeds, the sitemap and the affected category feeds, and rewrites a blob
+# only when its bytes actually changed.
+#
+# /post/<id> and /category/<name> need a login, so feed items link to pages
+# a reader must sign in to open (the excerpt is readable in the feed). The
+# sitemap lists only the public pages unless SITEMAP_LIST_POSTS=1, for when
+# posts are opened up; crawlers would otherwise index the login redirect.
+#
+# Links are built from SITE_URL only, never from the request's Host header:
+# a blob is served to every visitor, so one forged request would otherwise
+# point every link at another site. Without SITE_URL nothing is built and
+# the feed routes answer 503.
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import quote
+from xml.sax.saxutils import escape, quoteattr
+
+from flask import Response, request
+
+from db import BASE_DIR, fetch_all
+
+FEED_CACHE_DIR = os.environ.get("FEED_CACHE_DIR", os.path.join(BASE_DIR, "feed_cache"))
+SITE_URL = os.environ.get("SITE_URL")
+SITEMAP_LIST_POSTS = os.environ.get("SITEMAP_LIST_POSTS", "0") == "1"
+SITE_TITLE = "Upgrade Daily"
+SITE_DESCRIPTION = "Wisdom on spirituality, science, technology and Indian culture"
+FEED_SIZE = 20
+CACHE_SECONDS = 300
+
+FEED_COLUMNS = "id, title, excerpt, category, created_at"
+
+os.makedirs(FEED_CACHE_DIR, exist_ok=True)
+
+
+def category_key(category):
+    return "category-" + re.sub(r"[^a-z0-9]+", "-", category.lower()).strip("-")
+
+
+def _parse_date(value):
+    try:
+        dt = datetime.fromisoformat((value or "").replace("Z", "+00:00"))
+    except ValueError:
+        dt = datetime.now(timezone.utc)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _post_url(base_url, post):
+    return f"{base_url}/post/{post['id']}"
+
+
+def _category_url(base_url, category):
+    return f"{base_url}/category/{quote(category)}"
+
+
+def render_rss(posts, base_url, title, link, self_url):
+    items = []
+    for post in posts:
+        url = _post_url(base_url, post)
+        items.append(
+            "<item>"
+            f"<title>{escape(post['title'])}</title>"
+            f"<link>{escape(url)}</link>"
+            f"<guid isPermaLink=\"true\">{escape(url)}</guid>"
+            f"<category>{escape(post['category'])}</category>"
+            f"<pubDate>{format_datetime(_parse_date(post['created_at']))}</pubDate>"
+            f"<description>{escape(post.get('excerpt') or '')}</description>"
+            "</item>"
+        )
+    updated = format_datetime(_parse_date(posts[0]["created_at"])) if posts else format_datetime(datetime.now(timezone.utc))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+        f"<title>{escape(title)}</title>"
+        f"<link>{escape(link)}</link>"
+        f"<description>{escape(SITE_DESCRIPTION)}</description>"
+        f"<atom:link href={quoteattr(self_url)} rel=\"self\" type=\"application/rss+xml\"/>"
+        f"<lastBuildDate>{updated}</lastBuildDate>"
+        + "".join(items)
+        + "</channel></rss>\n"
+    )
+
+
+def render_atom(posts, base_url, title, self_url):
+    entries = []
+    for post in posts:
+        url = _post_url(base_url, post)
+        stamp = _parse_date(post["created_at"]).isoformat()
+        entries.append(
+            "<entry>"
+            f"<title>{escape(post['title'])}</title>"
+            f"<link href={quoteattr(url)}/>"
+            f"<id>{escape(url)}</id>"
+            f"<updated>{stamp}</updated>"
+            f"<published>{stamp}</published>"
+            f"<category term={quoteattr(post['category'])}/>"
+            f"<summary>{escape(post.get('excerpt') or '')}</summary>"
+            "</entry>"
+        )
+    updated = _parse_date(posts[0]["created_at"]).isoformat() if posts else datetime.now(timezone.utc).isoformat()
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>{escape(title)}</title>"
+        f"<link href={quoteattr(base_url + '/')}/>"
+        f"<link rel=\"self\" href={quoteattr(self_url)}/>"
+        f"<id>{escape(base_url)}/</id>"
+        f"<updated>{updated}</updated>"
+        f"<author><name>{escape(SITE_TITLE)}</name></author>"
+        + "".join(entries)
+        + "</feed>\n"
+    )
+
+
+def render_sitemap(posts, categories, base_url):
+    urls = [(f"{base_url}/", None), (f"{base_url}/about", None), (f"{base_url}/contact", None)]
+    urls += [(_category_url(base_url, c), None) for c in categories]
+    urls += [(_post_url(base_url, p), _parse_date(p["created_at"]).date().isoformat()) for p in posts]
+    body = []
+    for loc, lastmod in urls:
+        body.append(
+            f"<url><loc>{escape(loc)}</loc>"
+            + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "")
+            + "</url>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        + "".join(body)
+        + "</urlset>\n"
+    )
+
+
+def _path(key, suffix):
+    return os.path.join(FEED_CACHE_DIR, key + suffix)
+
+
+def store(key, body):
+    """Write the plain and gzip blobs; returns False when nothing changed"""
+    data = body.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    meta = load_meta(key)
+    if meta and meta["etag"] == f'"{digest}"':
+        return False
+
+    last_modified = format_datetime(datetime.now(timezone.utc).replace(microsecond=0), usegmt=True)
+    variants = (
+        (".xml", f'"{digest}"', data),
+        # Different bytes, so a different strong ETag
+        (".xml.gz", f'"{digest}-gz"', gzip.compress(data, 9, mtime=0)),
+    )
+    for suffix, etag, payload in variants:
+        header = json.dumps({"etag": etag, "last_modified": last_modified}).encode() + b"\n"
+        # Unique temp name per writer; the rename is atomic for readers
+        fd, tmp = tempfile.mkstemp(dir=FEED_CACHE_DIR, prefix=key + suffix, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(payload)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, _path(key, suffix))
+        except Exception:
+            os.remove(tmp)
+            raise
+    return True
+
+
+def _load(key, suffix, with_body=False):
+    """(meta, body) from one stored file; (None, None) when missing or unreadable"""
+    try:
+        with open(_path(key, suffix), "rb") as f:
+            meta = json.loads(f.readline())
+            return meta, f.read() if with_body else None
+    except (OSError, ValueError):
+        return None, None
+
+
+def load_meta(key):
+    return _load(key, ".xml")[0]
+
+
+def build_feeds(client, categories, all_categories):
+    """Re-render the main feeds, the sitemap and the given category feeds"""
+    if not SITE_URL:
+        raise RuntimeError("SITE_URL is not set")
+    base_url = SITE_URL.rstrip("/")
+    changed = []
+
+    latest = (
+        client.table("posts").select(FEED_COLUMNS)
+        .order("created_at", desc=True).limit(FEED_SIZE).execute().data or []
+    )
+    if store("feed", render_rss(latest, base_url, SITE_TITLE, f"{base_url}/", f"{base_url}/feed.xml")):
+        changed.append("feed")
+    if store("atom", render_atom(latest, base_url, SITE_TITLE, f"{base_url}/atom.xml")):
+        changed.append("atom")
+
+    for category in categories:
+        posts = (
+            client.table("posts").select(FEED_COLUMNS).eq("category", category)
+            .order("created_at", desc=True).limit(FEED_SIZE).execute().data or []
+        )
+        self_url = f"{_category_url(base_url, category)}/feed.xml"
+        title = f"{SITE_TITLE} - {category}"
+        if store(category_key(category), render_rss(posts, base_url, title, _category_url(base_url, category), self_url)):
+            changed.append(category_key(category))
+
+    everything, listed_categories = [], []
+    if SITEMAP_LIST_POSTS:
+        everything = fetch_all(lambda: client.table("posts").select("id, created_at").order("id"))
+        listed_categories = all_categories
+    if store("sitemap", render_sitemap(everything, listed_categories, base_url)):
+        changed.append("sitemap")
+
+    return changed
+
+
+_build_lock = threading.Lock()
+_build_state = {"running": False, "pending": set()}
+
+
+def schedule_rebuild(client, categories, all_categories):
+    """
+    Rebuild in a background thread. Categories from calls made while a
+    rebuild is running are collected and handled in one more pass.
+    """
+    if not SITE_URL:
+        return
+    with _build_lock:
+        _build_state["pending"].update(c for c in categories if c)
+        if _build_state["running"]:
+            return
+        _build_state["running"] = True
+
+    def worker():
+        while True:
+            with _build_lock:
+                pending, _build_state["pending"] = _build_state["pending"], set()
+            try:
+                changed = build_feeds(client, sorted(pending), all_categories)
+                print(f"✅ Feeds rebuilt ({', '.join(changed) or 'no changes'})")
+            except Exception as e:
+                print(f"❌ Feed rebuild error: {e}")
+            with _build_lock:
+                if not _build_state["pending"]:
+                    _build_state["running"] = False
+                    return
+
+    threading.Thread(target=worker, name="feed-rebuild", daemon=True).start()
+
+
+def feed_response(key, mimetype):
+    """Serve a stored blob with ETag/Last-Modified and precompressed gzip"""
+    gzipped = "gzip" in request.headers.get("Accept-Encoding", "")
+    meta, data = _load(key, ".xml.gz" if gzipped else ".xml", with_body=True)
+    if meta is None:
+        return None
+
+    headers = {
+        "ETag": meta["etag"],
+        "Last-Modified": meta["last_modified"],
+        "Cache-Control": f"public, max-age={CACHE_SECONDS}",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if meta["etag"] in tags or if_none_match.strip() == "*":
+            return Response(status=304, headers=headers)
+    elif request.headers.get("If-Modified-Since"):
+        try:
+            since = parsedate_to_datetime(request.headers["If-Modified-Since"])
+            if since >= parsedate_to_datetime(meta["last_modified"]):
+                return Response(status=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return Response(data, mimetype=mimetype, headers=headers)
@@ -0,0 +1,289 @@
+# -------------------------------------------------------------
+# VERSIONED SCHEMA MIGRATIONS + ONLINE BACKFILLS
+# -------------------------------------------------------------
+# migrations/<backend>/NNNN_name.up.sql   forward script
+# migrations/<backend>/NNNN_name.down.sql backward script
+#
+# Applied versions are recorded in schema_migrations. Postgres runs in
+# autocommit (CONCURRENTLY index builds need it), so every script there
+# must be safe to re-run (IF [NOT] EXISTS) in case it stops half way.
+#
+# Backfills fill derived columns for existing rows in small id-ordered
+# batches. Progress is saved after every batch, so an interrupted run
+# picks up where it stopped.
+import os
+import time
+from datetime import datetime
+
+from db import BASE_DIR, connect, sql_for, split_statements
+from derived import make_excerpt
+
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations")
+
+HISTORY_TABLES = (
+    """CREATE TABLE IF NOT EXISTS schema_migrations (
+        version TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS backfill_progress (
+        name TEXT PRIMARY KEY,
+        last_id BIGINT NOT NULL DEFAULT 0,
+        rows_done BIGINT NOT NULL DEFAULT 0,
+        finished BOOLEAN NOT NULL DEFAULT FALSE,
+        updated_at TIMESTAMP NOT NULL
+    )""",
+)
+
+# Supabase exposes every public table over REST; with RLS on and no
+# policies only the service key (which bypasses RLS) can touch them.
+POSTGRES_HISTORY_RLS = (
+    "ALTER TABLE schema_migrations ENABLE ROW LEVEL SECURITY",
+    "ALTER TABLE backfill_progress ENABLE ROW LEVEL SECURITY",
+)
+
+# name -> spec. "compute" receives a row dict of "columns" and returns the
+# column values to write back; "where" limits the batch to rows still
+# missing data so rows the app already filled are left alone.
+BACKFILLS = {
+    "post_excerpt": {
+        "requires": "0002",
+        "table": "posts",
+        "columns": ("content",),
+        "where": "excerpt IS NULL",
+        "compute": lambda row: {"excerpt": make_excerpt(row["content"])},
+    },
+}
+
+MIN_BATCH = 50
+MAX_BATCH = 5000
+TARGET_BATCH_SECONDS = 0.5
+
+
+def discover(backend):
+    """All migrations for a backend as [(version, name, up_path, down_path)]"""
+    folder = os.path.join(MIGRATIONS_DIR, backend)
+    found = []
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".up.sql"):
+            continue
+        stem = filename[: -len(".up.sql")]
+        version, name = stem.split("_", 1)
+        down_path = os.path.join(folder, stem + ".down.sql")
+        found.append((
+            version,
+            name,
+            os.path.join(folder, filename),
+            down_path if os.path.exists(down_path) else None,
+        ))
+    return found
+
+
+def _ensure_history(conn, backend):
+    cur = conn.cursor()
+    for statement in HISTORY_TABLES:
+        cur.execute(statement)
+    if backend == "postgres":
+        for statement in POSTGRES_HISTORY_RLS:
+            cur.execute(statement)
+    conn.commit()
+
+
+def _applied_versions(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def _run_script(conn, path):
+    cur = conn.cursor()
+    with open(path) as f:
+        for statement in split_statements(f.read()):
+            cur.execute(statement)
+
+
+def status(backend):
+    """[(version, name, applied)] for every known migration"""
+    conn = connect(backend)
+    try:
+        _ensure_history(conn, backend)
+        applied = _applied_versions(conn)
+    finally:
+        conn.close()
+    return [(version, name, version in applied) for version, name, _, _ in discover(backend)]
+
+
+def upgrade(backend, target=None, report=print):
+    """Apply pending migrations up to and including target (default: all)"""
+    conn = connect(backend)
+    done = []
+    try:
+        _ensure_history(conn, backend)
+        applied = _applied_versions(conn)
+        for version, name, up_path, _ in discover(backend):
+            if target and version > target:
+                break
+            if version in applied:
+                continue
+            report(f"🔄 Applying {version}_{name}")
+            _run_script(conn, up_path)
+            conn.cursor().execute(
+                sql_for(backend, "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)"),
+                (version, name, datetime.utcnow().isoformat()),
+            )
+            conn.commit()
+            done.append(version)
+    finally:
+        conn.close()
+    return done
+
+
+def downgrade(backend, target=None, report=print):
+    """Revert applied migrations newer than target (default: only the latest)"""
+    conn = connect(backend)
+    done = []
+    try:
+        _ensure_history(conn, backend)
+        applied = _applied_versions(conn)
+        to_revert = [m for m in reversed(discover(backend)) if m[0] in applied]
+        if target is None:
+            to_revert = to_revert[:1]
+        else:
+            to_revert = [m for m in to_revert if m[0] > target]
+
+        for version, name, _, down_path in to_revert:
+            if not down_path:
+                raise RuntimeError(f"{version}_{name} has no down script")
+            report(f"🔄 Reverting {version}_{name}")
+            _run_script(conn, down_path)
+            cur = conn.cursor()
+            cur.execute(
+                sql_for(backend, "DELETE FROM schema_migrations WHERE version = ?"),
+                (version,),
+            )
+            # The columns a backfill filled are gone, so its progress is too
+            for backfill_name, spec in BACKFILLS.items():
+                if spec["requires"] == version:
+                    cur.execute(
+                        sql_for(backend, "DELETE FROM backfill_progress WHERE name = ?"),
+                        (backfill_name,),
+                    )
+            conn.commit()
+            done.append(version)
+    finally:
+        conn.close()
+    return done
+
+
+def _format_eta(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def run_backfill(backend, name, batch_size=500, max_duty=0.5, restart=False, report=print):
+    """
+    Backfill one derived column set in resumable batches.
+
+    max_duty is the share of wall-clock time spent writing: after a batch
+    that took t seconds the runner sleeps t * (1 - max_duty) / max_duty.
+    The batch size also adapts so each batch stays near
+    TARGET_BATCH_SECONDS, keeping row locks short under production load.
+    """
+    spec = BACKFILLS[name]
+    if not 0 < max_duty <= 1:
+        raise ValueError("max_duty must be in (0, 1]")
+
+    conn = connect(backend, autocommit=False)
+    try:
+        _ensure_history(conn, backend)
+        if spec["requires"] not in _applied_versions(conn):
+            raise RuntimeError(f"Backfill {name} needs migration {spec['requires']}: run 'flask db upgrade' first")
+
+        cur = conn.cursor()
+        now = datetime.utcnow().isoformat()
+        if restart:
+            cur.execute(sql_for(backend, "DELETE FROM backfill_progress WHERE name = ?"), (name,))
+        cur.execute(sql_for(backend, "SELECT last_id, rows_done, finished FROM backfill_progress WHERE name = ?"), (name,))
+        row = cur.fetchone()
+        if row is None:
+            cur.execute(
+                sql_for(backend, "INSERT INTO backfill_progress (name, last_id, rows_done, finished, updated_at) VALUES (?, 0, 0, ?, ?)"),
+                (name, False, now),
+            )
+            last_id, rows_done, finished = 0, 0, False
+        else:
+            last_id, rows_done, finished = row
+        conn.commit()
+
+        if finished:
+            report(f"✅ {name} already finished ({rows_done} rows). Use --restart to run it again.")
+            return rows_done
+
+        table, columns, where = spec["table"], spec["columns"], spec["where"]
+        cur.execute(sql_for(backend, f"SELECT COUNT(*) FROM {table} WHERE id > ? AND {where}"), (last_id,))
+        remaining = cur.fetchone()[0]
+        conn.commit()
+        report(f"🔄 {name}: {remaining} rows to go (resuming after id {last_id})")
+
+        select_sql = sql_for(
+            backend,
+            f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > ? AND {where} ORDER BY id LIMIT ?",
+        )
+        started = time.monotonic()
+        done_this_run = 0
+
+        while True:
+            batch_started = time.monotonic()
+            cur.execute(select_sql, (last_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for row in rows:
+                values = spec["compute"](dict(zip(columns, row[1:])))
+                updates.append((values, row[0]))
+            targets = list(updates[0][0].keys())
+            update_sql = sql_for(
+                backend,
+                f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in targets)} WHERE id = ?",
+            )
+            cur.executemany(update_sql, [tuple(v[c] for c in targets) + (row_id,) for v, row_id in updates])
+
+            last_id = rows[-1][0]
+            rows_done += len(rows)
+            done_this_run += len(rows)
+            cur.execute(
+                sql_for(backend, "UPDATE backfill_progress SET last_id = ?, rows_done = ?, updated_at = ? WHERE name = ?"),
+                (last_id, rows_done, datetime.utcnow().isoformat(), name),
+            )
+            conn.commit()
+
+            batch_seconds = time.monotonic() - batch_started
+            rate = done_this_run / max(time.monotonic() - started, 1e-6)
+            left = max(remaining - done_this_run, 0)
+            pct = 100.0 * done_this_run / remaining if remaining else 100.0
+            report(
+                f"   {done_this_run}/{remaining} ({pct:.1f}%) last id {last_id}, "
+                f"{rate:.0f} rows/s, ETA {_format_eta(left / rate if rate else 0)}, batch {batch_size}"
+            )
+
+            if batch_seconds > TARGET_BATCH_SECONDS:
+                batch_size = max(MIN_BATCH, batch_size // 2)
+            elif batch_seconds < TARGET_BATCH_SECONDS / 2:
+                batch_size = min(MAX_BATCH, batch_size * 2)
+            time.sleep(batch_seconds * (1 - max_duty) / max_duty)
+
+        cur.execute(
+            sql_for(backend, "UPDATE backfill_progress SET finished = ?, updated_at = ? WHERE name = ?"),
+            (True, datetime.utcnow().isoformat(), name),
+        )
+        conn.commit()
+        report(f"✅ {name} finished: {done_this_run} rows this run, {rows_done} total")
+        return rows_done
+    finally:
+        conn.close()
@@ -0,0 +1,5 @@
+DROP INDEX CONCURRENTLY IF EXISTS idx_messages_unread;
+DROP INDEX CONCURRENTLY IF EXISTS idx_messages_created_at;
+DROP INDEX CONCURRENTLY IF EXISTS idx_posts_author_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_posts_category_created_at;
+DROP INDEX CONCURRENTLY IF EXISTS idx_posts_created_at;
@@ -0,0 +1 @@
+ALTER TABLE posts DROP COLUMN IF EXISTS excerpt;
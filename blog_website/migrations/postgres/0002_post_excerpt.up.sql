@@ -0,0 +1,4 @@
+-- Plain-text excerpt for listing cards. Filled in by the app on
+-- create/edit and for existing rows by: flask db backfill post_excerpt
+-- A nullable column without a default is a metadata-only change.
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS excerpt TEXT;
@@ -0,0 +1,14 @@
+-- Precomputed related posts and prev/next-in-category links, one row per
+-- post, so view_post needs a single primary-key lookup.
+-- related / prev_post / next_post hold JSON: {"id", "title", "category"}
+CREATE TABLE IF NOT EXISTS post_relations (
+    post_id BIGINT PRIMARY KEY REFERENCES posts (id) ON DELETE CASCADE,
+    related JSONB NOT NULL DEFAULT '[]'::jsonb,
+    prev_post JSONB,
+    next_post JSONB,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Supabase exposes public tables over REST. With RLS on and no policies
+-- only the service key (which bypasses RLS) can read or write rows.
+ALTER TABLE post_relations ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,5 @@
+DROP FUNCTION IF EXISTS page_view_stats(DATE, INT);
+DROP FUNCTION IF EXISTS record_page_views(JSONB, JSONB);
+DROP TABLE IF EXISTS visitor_sketches;
+DROP TABLE IF EXISTS category_views_daily;
+DROP TABLE IF EXISTS post_views_daily;
@@ -0,0 +1,91 @@
+-- Daily page-view rollups written by analytics.py in batched deltas.
+CREATE TABLE IF NOT EXISTS post_views_daily (
+    post_id BIGINT NOT NULL REFERENCES posts (id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    views BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (post_id, day)
+);
+CREATE INDEX IF NOT EXISTS idx_post_views_daily_day ON post_views_daily (day);
+
+CREATE TABLE IF NOT EXISTS category_views_daily (
+    category TEXT NOT NULL,
+    day DATE NOT NULL,
+    views BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (category, day)
+);
+CREATE INDEX IF NOT EXISTS idx_category_views_daily_day ON category_views_daily (day);
+
+-- HyperLogLog registers (hex) per scope ("site", "post:<id>",
+-- "category:<name>"), day and worker. Each worker only overwrites its own
+-- row. The dashboard merges rows by taking the register-wise max.
+CREATE TABLE IF NOT EXISTS visitor_sketches (
+    scope TEXT NOT NULL,
+    day DATE NOT NULL,
+    worker_id TEXT NOT NULL,
+    registers TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (scope, day, worker_id)
+);
+CREATE INDEX IF NOT EXISTS idx_visitor_sketches_day ON visitor_sketches (day);
+
+-- Adds one flush worth of deltas in a single round trip. Rows for posts
+-- deleted since the views were counted are dropped by the join.
+CREATE OR REPLACE FUNCTION record_page_views(post_rows JSONB, category_rows JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO post_views_daily AS t (post_id, day, views)
+    SELECT (r->>'post_id')::BIGINT, (r->>'day')::DATE, (r->>'views')::BIGINT
+    FROM jsonb_array_elements(post_rows) AS r
+    JOIN posts p ON p.id = (r->>'post_id')::BIGINT
+    ON CONFLICT (post_id, day) DO UPDATE SET views = t.views + EXCLUDED.views;
+
+    INSERT INTO category_views_daily AS t (category, day, views)
+    SELECT r->>'category', (r->>'day')::DATE, (r->>'views')::BIGINT
+    FROM jsonb_array_elements(category_rows) AS r
+    ON CONFLICT (category, day) DO UPDATE SET views = t.views + EXCLUDED.views;
+$$;
+
+-- Dashboard totals summed in the database, so the REST row cap never
+-- truncates them: {"series": [{day, views}], "top_posts": [{post_id,
+-- views}], "top_categories": [{category, views}]} for days >= since.
+CREATE OR REPLACE FUNCTION page_view_stats(since DATE, top_n INT)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'series', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('day', day, 'views', views) ORDER BY day)
+            FROM (
+                SELECT day, SUM(views) AS views
+                FROM post_views_daily WHERE day >= since GROUP BY day
+            ) d
+        ), '[]'::jsonb),
+        'top_posts', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('post_id', post_id, 'views', views) ORDER BY views DESC, post_id)
+            FROM (
+                SELECT post_id, SUM(views) AS views
+                FROM post_views_daily WHERE day >= since GROUP BY post_id
+                ORDER BY views DESC, post_id LIMIT top_n
+            ) p
+        ), '[]'::jsonb),
+        'top_categories', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('category', category, 'views', views) ORDER BY views DESC, category)
+            FROM (
+                SELECT category, SUM(views) AS views
+                FROM category_views_daily WHERE day >= since GROUP BY category
+                ORDER BY views DESC, category LIMIT top_n
+            ) c
+        ), '[]'::jsonb)
+    );
+$$;
+
+-- Supabase exposes public tables and functions over REST. With RLS on and
+-- no policies, and EXECUTE revoked, only the service key can use them.
+-- Otherwise any visitor could read the stats or inflate the counters.
+ALTER TABLE post_views_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE category_views_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE visitor_sketches ENABLE ROW LEVEL SECURITY;
+REVOKE EXECUTE ON FUNCTION record_page_views(JSONB, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION page_view_stats(DATE, INT) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,5 @@
+DROP INDEX IF EXISTS idx_messages_unread;
+DROP INDEX IF EXISTS idx_messages_created_at;
+DROP INDEX IF EXISTS idx_posts_author_id;
+DROP INDEX IF EXISTS idx_posts_category_created_at;
+DROP INDEX IF EXISTS idx_posts_created_at;
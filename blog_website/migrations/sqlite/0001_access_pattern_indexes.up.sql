@@ -0,0 +1,24 @@
+-- Indexes for the fixed access patterns in app.py.
+-- users.username is already covered by its UNIQUE constraint.
+
+-- index / dashboard: latest posts first
+CREATE INDEX IF NOT EXISTS idx_posts_created_at
+    ON posts (created_at DESC);
+
+-- view_category / about: posts in a category, newest first
+CREATE INDEX IF NOT EXISTS idx_posts_category_created_at
+    ON posts (category, created_at DESC);
+
+-- users(username) embed and FK checks when a user is removed
+CREATE INDEX IF NOT EXISTS idx_posts_author_id
+    ON posts (author_id);
+
+-- admin_messages: inbox ordered by date
+CREATE INDEX IF NOT EXISTS idx_messages_created_at
+    ON messages (created_at DESC);
+
+-- get_unread_count: only unread rows are indexed, so the badge count
+-- stays cheap no matter how large the archive grows
+CREATE INDEX IF NOT EXISTS idx_messages_unread
+    ON messages (created_at DESC)
+    WHERE is_read = 0;
@@ -0,0 +1,2 @@
+-- DROP COLUMN needs SQLite 3.35+
+ALTER TABLE posts DROP COLUMN excerpt;
@@ -0,0 +1,3 @@
+-- Plain-text excerpt for listing cards. Filled in by the app on
+-- create/edit and for existing rows by: flask db backfill post_excerpt
+ALTER TABLE posts ADD COLUMN excerpt TEXT;
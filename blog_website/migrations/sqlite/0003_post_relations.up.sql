@@ -0,0 +1,10 @@
+-- Precomputed related posts and prev/next-in-category links, one row per
+-- post, so view_post needs a single primary-key lookup.
+-- related / prev_post / next_post hold JSON: {"id", "title", "category"}
+CREATE TABLE IF NOT EXISTS post_relations (
+    post_id INTEGER PRIMARY KEY REFERENCES posts (id) ON DELETE CASCADE,
+    related TEXT NOT NULL DEFAULT '[]',
+    prev_post TEXT,
+    next_post TEXT,
+    updated_at TIMESTAMP NOT NULL
+);
@@ -0,0 +1,3 @@
+DROP TABLE IF EXISTS visitor_sketches;
+DROP TABLE IF EXISTS category_views_daily;
+DROP TABLE IF EXISTS post_views_daily;
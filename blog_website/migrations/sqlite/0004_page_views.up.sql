@@ -0,0 +1,28 @@
+-- Daily page-view rollups written by analytics.py in batched deltas.
+-- The record_page_views() and page_view_stats() functions only exist on
+-- Postgres.
+CREATE TABLE IF NOT EXISTS post_views_daily (
+    post_id INTEGER NOT NULL REFERENCES posts (id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (post_id, day)
+);
+CREATE INDEX IF NOT EXISTS idx_post_views_daily_day ON post_views_daily (day);
+
+CREATE TABLE IF NOT EXISTS category_views_daily (
+    category TEXT NOT NULL,
+    day DATE NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (category, day)
+);
+CREATE INDEX IF NOT EXISTS idx_category_views_daily_day ON category_views_daily (day);
+
+CREATE TABLE IF NOT EXISTS visitor_sketches (
+    scope TEXT NOT NULL,
+    day DATE NOT NULL,
+    worker_id TEXT NOT NULL,
+    registers TEXT NOT NULL,
+    updated_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, day, worker_id)
+);
+CREATE INDEX IF NOT EXISTS idx_visitor_sketches_day ON visitor_sketches (day);
@@ -0,0 +1,244 @@
+# -------------------------------------------------------------
+# OPT-IN REQUEST PROFILING
+# -------------------------------------------------------------
+# A request is profiled (cProfile + tracemalloc) when any of these hold:
+#   - random sampling: PROFILE_SAMPLE_RATE=0.01 profiles ~1% of requests
+#   - header: "X-Profile: <PROFILE_TOKEN>", or "X-Profile: 1" from an admin
+#   - the admin toggle on /admin/profiles is on (shared flag file holding
+#     its expiry, PROFILE_TOGGLE_MINUTES after it was switched on)
+# Results go to PROFILE_DIR as <id>.prof (pstats) + <id>.json (summary).
+# Only the newest PROFILE_MAX_FILES are kept.
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from flask import g, request, session
+
+from db import BASE_DIR
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "50"))
+PROFILE_TOGGLE_MINUTES = int(os.environ.get("PROFILE_TOGGLE_MINUTES", "15"))
+TRACE_FRAMES = 10
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+
+TOGGLE_FILE = os.path.join(PROFILE_DIR, "ENABLED")
+TOGGLE_CHECK_SECONDS = 5
+PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9]+-[0-9a-f]{6}$")
+SKIP_ENDPOINTS = {"static", "favicon", "admin_profiles", "admin_profile", "download_profile", "toggle_profiling"}
+
+os.makedirs(PROFILE_DIR, exist_ok=True)
+
+# Only one profiled request per process at a time: cProfile and
+# tracemalloc are process-wide, so overlapping runs would mix results.
+_active = threading.Lock()
+
+# The toggle file is re-read at most every TOGGLE_CHECK_SECONDS per process
+_toggle_cache = {"checked": float("-inf"), "enabled": False}
+
+
+def enabled_until():
+    """UTC expiry of the admin toggle, or None when it is off"""
+    try:
+        with open(TOGGLE_FILE) as f:
+            expires = datetime.fromisoformat(f.read().strip())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        expires = None
+    if expires is None or expires <= datetime.utcnow():
+        # A forgotten toggle must not keep profiling every request
+        set_enabled(False)
+        return None
+    return expires
+
+
+def is_enabled():
+    now = time.monotonic()
+    if now - _toggle_cache["checked"] >= TOGGLE_CHECK_SECONDS:
+        _toggle_cache["enabled"] = enabled_until() is not None
+        _toggle_cache["checked"] = now
+    return _toggle_cache["enabled"]
+
+
+def set_enabled(enabled):
+    _toggle_cache["checked"] = float("-inf")
+    if enabled:
+        with open(TOGGLE_FILE, "w") as f:
+            f.write((datetime.utcnow() + timedelta(minutes=PROFILE_TOGGLE_MINUTES)).isoformat())
+    else:
+        try:
+            os.remove(TOGGLE_FILE)
+        except FileNotFoundError:
+            pass
+
+
+def _trigger():
+    """Why this request should be profiled, or None"""
+    header = request.headers.get("X-Profile")
+    if header:
+        if PROFILE_TOKEN and hmac.compare_digest(header.encode(), PROFILE_TOKEN.encode()):
+            return "header"
+        if header == "1" and session.get("is_admin"):
+            return "header"
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "sample"
+    if is_enabled():
+        return "toggle"
+    return None
+
+
+def _start():
+    if request.endpoint in SKIP_ENDPOINTS:
+        return
+    trigger = _trigger()
+    if not trigger or not _active.acquire(blocking=False):
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACE_FRAMES)
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    g._profile = {
+        "trigger": trigger,
+        "profiler": profiler,
+        "started_tracing": started_tracing,
+        "started": time.perf_counter(),
+    }
+    profiler.enable()
+
+
+def _finish(status):
+    state = g.pop("_profile", None)
+    if state is None:
+        return
+    try:
+        state["profiler"].disable()
+        duration = time.perf_counter() - state["started"]
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        _, peak = tracemalloc.get_traced_memory()
+        if state["started_tracing"]:
+            tracemalloc.stop()
+        _save(state, status, duration, snapshot, peak)
+    except Exception as e:
+        print(f"❌ Profile save error: {e}")
+    finally:
+        _active.release()
+
+
+def _save(state, status, duration, snapshot, peak):
+    profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    state["profiler"].dump_stats(os.path.join(PROFILE_DIR, profile_id + ".prof"))
+
+    stats = pstats.Stats(state["profiler"])
+    functions = []
+    for (filename, line, name), (cc, nc, tottime, cumtime, _) in stats.stats.items():
+        functions.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": nc,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        })
+    functions.sort(key=lambda f: f["cumtime_ms"], reverse=True)
+
+    allocations = [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kib": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ]
+
+    summary = {
+        "id": profile_id,
+        "created_at": datetime.utcnow().isoformat(),
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "endpoint": request.endpoint,
+        "status": status,
+        "trigger": state["trigger"],
+        "duration_ms": round(duration * 1000, 2),
+        "peak_kib": round(peak / 1024, 1),
+        "functions": functions[:TOP_FUNCTIONS],
+        "allocations": allocations,
+    }
+    with open(os.path.join(PROFILE_DIR, profile_id + ".json"), "w") as f:
+        json.dump(summary, f)
+    _prune()
+
+
+def _prune():
+    """Ring buffer: drop the oldest profiles beyond PROFILE_MAX_FILES"""
+    # Ids only have one-second resolution, so order by write time instead
+    written = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json"):
+            try:
+                written.append((os.stat(os.path.join(PROFILE_DIR, name)).st_mtime_ns, name[:-5]))
+            except OSError:
+                pass
+    ids = [profile_id for _, profile_id in sorted(written)]
+    for profile_id in ids[:max(len(ids) - PROFILE_MAX_FILES, 0)]:
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except OSError:
+                pass
+
+
+def list_profiles():
+    """Summaries (without the detail tables), newest first"""
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        summary = load_profile(name[:-5])
+        if summary:
+            summary.pop("functions", None)
+            summary.pop("allocations", None)
+            profiles.append(summary)
+    return profiles
+
+
+def load_profile(profile_id):
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, profile_id + ".json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def init_app(app):
+    @app.before_request
+    def start_profile():
+        _start()
+
+    @app.after_request
+    def finish_profile(response):
+        _finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request is skipped when a view raises
+        if exc is not None:
+            _finish(500)
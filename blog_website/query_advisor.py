@@ -0,0 +1,197 @@
+# -------------------------------------------------------------
+# QUERY-PLAN ADVISOR
+# -------------------------------------------------------------
+# Every read the data layer issues (app.py and the modules it calls),
+# written as plain SQL so it can be EXPLAINed against either backend. Keep
+# this list in sync when a route gains or changes a supabase.table(...)
+# call. Reads that scan a whole table on purpose go in EXPECTED_SCANS with
+# the reason, so they are reported but do not fail the check.
+from db import connect, sql_for
+
+POST_WITH_AUTHOR = (
+    "SELECT p.*, u.username FROM posts p "
+    "LEFT JOIN users u ON u.id = p.author_id "
+)
+
+# name -> (route that issues it, sql, params)
+QUERIES = {
+    "index_latest_posts": (
+        "index",
+        POST_WITH_AUTHOR + "ORDER BY p.created_at DESC LIMIT 6",
+        (),
+    ),
+    "about_post": (
+        "about",
+        POST_WITH_AUTHOR + "WHERE p.category = ? ORDER BY p.created_at DESC LIMIT 1",
+        ("AboutMe",),
+    ),
+    "category_posts": (
+        "view_category",
+        POST_WITH_AUTHOR + "WHERE p.category = ? ORDER BY p.created_at DESC",
+        ("Spiritual",),
+    ),
+    "post_by_id": (
+        "view_post",
+        POST_WITH_AUTHOR + "WHERE p.id = ?",
+        (1,),
+    ),
+    "edit_post_lookup": (
+        "edit_post",
+        "SELECT * FROM posts WHERE id = ?",
+        (1,),
+    ),
+    "post_relations": (
+        "view_post",
+        "SELECT * FROM post_relations WHERE post_id = ?",
+        (1,),
+    ),
+    "user_by_username": (
+        "login / register / setup_admin",
+        "SELECT * FROM users WHERE username = ?",
+        ("ajainhr",),
+    ),
+    "dashboard_posts": (
+        "admin_dashboard",
+        POST_WITH_AUTHOR + "ORDER BY p.created_at DESC",
+        (),
+    ),
+    "dashboard_message_count": (
+        "admin_dashboard",
+        "SELECT COUNT(id) FROM messages",
+        (),
+    ),
+    "dashboard_user_count": (
+        "admin_dashboard",
+        "SELECT COUNT(id) FROM users",
+        (),
+    ),
+    "debug_posts": (
+        "debug_posts",
+        POST_WITH_AUTHOR,
+        (),
+    ),
+    "debug_users": (
+        "debug_users",
+        "SELECT * FROM users",
+        (),
+    ),
+    "unread_message_count": (
+        "get_unread_count",
+        "SELECT COUNT(id) FROM messages WHERE is_read = ?",
+        (False,),
+    ),
+    # The three aggregates inside page_view_stats()
+    "dashboard_views_by_day": (
+        "admin_dashboard",
+        "SELECT day, SUM(views) AS views FROM post_views_daily WHERE day >= ? GROUP BY day",
+        ("2026-01-01",),
+    ),
+    "dashboard_top_posts": (
+        "admin_dashboard",
+        "SELECT post_id, SUM(views) AS views FROM post_views_daily WHERE day >= ? "
+        "GROUP BY post_id ORDER BY views DESC, post_id LIMIT ?",
+        ("2026-01-01", 5),
+    ),
+    "dashboard_top_categories": (
+        "admin_dashboard",
+        "SELECT category, SUM(views) AS views FROM category_views_daily WHERE day >= ? "
+        "GROUP BY category ORDER BY views DESC, category LIMIT ?",
+        ("2026-01-01", 5),
+    ),
+    "dashboard_visitor_sketches": (
+        "admin_dashboard",
+        "SELECT scope, registers FROM visitor_sketches WHERE scope IN (?, ?) AND day >= ? "
+        "ORDER BY scope, day, worker_id LIMIT 1000",
+        ("site", "post:1", "2026-01-01"),
+    ),
+    "feed_latest_posts": (
+        "feeds.build_feeds",
+        "SELECT id, title, excerpt, category, created_at FROM posts ORDER BY created_at DESC LIMIT ?",
+        (20,),
+    ),
+    "feed_category_posts": (
+        "feeds.build_feeds",
+        "SELECT id, title, excerpt, category, created_at FROM posts WHERE category = ? "
+        "ORDER BY created_at DESC LIMIT ?",
+        ("Spiritual", 20),
+    ),
+    "sitemap_posts": (
+        "feeds.build_feeds (SITEMAP_LIST_POSTS=1)",
+        "SELECT id, created_at FROM posts ORDER BY id LIMIT 1000 OFFSET ?",
+        (0,),
+    ),
+    "messages_inbox": (
+        "admin_messages",
+        "SELECT * FROM messages ORDER BY created_at DESC",
+        (),
+    ),
+}
+
+
+# name -> why a full scan is acceptable for now
+EXPECTED_SCANS = {
+    "debug_posts": "debug route dumps the whole table",
+    "debug_users": "debug route dumps the whole table",
+    "sitemap_posts": "the sitemap lists every post, paged in primary-key order",
+    "dashboard_top_posts": "ranks the per-post sums, one row per viewed post",
+    "dashboard_top_categories": "ranks the per-category sums, a handful of rows",
+}
+
+
+def _sqlite_plan(cur, sql, params):
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    lines = [row[3] for row in cur.fetchall()]
+    problems = []
+    for line in lines:
+        # "SCAN p" is a full table scan; "SCAN p USING INDEX" walks an index
+        if line.startswith("SCAN ") and "USING" not in line:
+            problems.append(f"full scan: {line}")
+        if "TEMP B-TREE" in line:
+            problems.append(f"sort without index: {line}")
+    return lines, problems
+
+
+def _postgres_plan(cur, sql, params):
+    # Tiny tables always get a Seq Scan, so discourage seq scans and sorts to
+    # find out whether an index path exists at all.
+    cur.execute("BEGIN")
+    try:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("SET LOCAL enable_sort = off")
+        cur.execute("EXPLAIN " + sql_for("postgres", sql), params)
+        lines = [row[0] for row in cur.fetchall()]
+    finally:
+        cur.execute("ROLLBACK")
+    problems = []
+    for line in lines:
+        node = line.strip().lstrip("->").strip()
+        if node.startswith("Seq Scan"):
+            problems.append(f"full scan: {node}")
+        if node.startswith("Sort "):
+            problems.append(f"sort without index: {node}")
+    return lines, problems
+
+
+def explain_queries(backend):
+    """EXPLAIN every known query; returns a list of report dicts"""
+    explain = _sqlite_plan if backend == "sqlite" else _postgres_plan
+    report = []
+    conn = connect(backend)
+    try:
+        cur = conn.cursor()
+        for name, (route, sql, params) in QUERIES.items():
+            try:
+                plan, problems = explain(cur, sql, params)
+            except Exception as e:
+                # e.g. a table from a migration that is not applied yet
+                plan, problems = [], [f"could not explain: {e}"]
+            report.append({
+                "name": name,
+                "route": route,
+                "plan": plan,
+                "problems": problems,
+                "expected": EXPECTED_SCANS.get(name) if problems else None,
+            })
+    finally:
+        conn.close()
+    return report
@@ -0,0 +1,206 @@
+# -------------------------------------------------------------
+# RELATED POSTS + PREV/NEXT IN CATEGORY
+# -------------------------------------------------------------
+# Similarity is computed in one batch over every post (TF-IDF on title +
+# content, cosine via an inverted index) and the results are stored in
+# post_relations. view_post only reads that row; nothing is computed on
+# request. After create/edit/delete a background refresh re-ranks only the
+# changed posts, the posts sharing a term with them and the posts that
+# listed them, then writes back only the rows whose links changed.
+#
+# Limitation: the refresh still reads every post's content (paged) to
+# rebuild the TF-IDF space; only the scoring and the writes are scoped.
+# Rows outside the affected set keep scores from the last full pass, so
+# run 'flask rebuild-related' now and then to fold in IDF drift.
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from db import fetch_all
+from derived import plain_text
+
+TOP_K = 4
+TITLE_WEIGHT = 3
+MIN_SCORE = 0.05
+EXCLUDED_CATEGORIES = {"AboutMe"}
+
+POST_COLUMNS = "id, title, content, category, created_at"
+
+# Latin words plus the Devanagari block (its vowel signs are not \w)
+TOKEN_RE = re.compile("[\\w\u0900-\u097f]+")
+STOPWORDS = set("""
+a an and are as at be by for from has have in is it its of on or that the
+this to was we were will with you your our they their he she his her not
+but if so do does did can all any about into than then there these those
+""".split())
+
+
+def tokenize(text):
+    return [
+        t for t in TOKEN_RE.findall(plain_text(text).lower())
+        if len(t) > 1 and t not in STOPWORDS and not t.isdigit()
+    ]
+
+
+def _link(post):
+    return {"id": post["id"], "title": post["title"], "category": post["category"]}
+
+
+def _tfidf_vectors(posts):
+    """L2-normalised sparse TF-IDF vectors as {post_id: {term: weight}}"""
+    counts = {}
+    df = Counter()
+    for post in posts:
+        terms = Counter(tokenize(post["content"]))
+        for term in tokenize(post["title"]):
+            terms[term] += TITLE_WEIGHT
+        counts[post["id"]] = terms
+        df.update(terms.keys())
+
+    n = len(posts)
+    idf = {term: math.log((1 + n) / (1 + d)) + 1 for term, d in df.items()}
+
+    vectors = {}
+    for post_id, terms in counts.items():
+        vec = {term: (1 + math.log(tf)) * idf[term] for term, tf in terms.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        vectors[post_id] = {term: w / norm for term, w in vec.items()}
+    return vectors
+
+
+def compute_relations(posts, top_k=TOP_K, changed_ids=None, linked_ids=()):
+    """
+    Build {post_id: {"related": [...], "prev_post": ..., "next_post": ...}}
+    for a list of post dicts (id, title, content, category, created_at).
+
+    With changed_ids, "related" is only ranked for those posts, posts that
+    share a term with them, and linked_ids (posts whose stored list points
+    at a changed post); every other entry gets "related": None, meaning
+    keep the stored list. prev/next is cheap and always rebuilt.
+    """
+    posts = [p for p in posts if p["category"] not in EXCLUDED_CATEGORIES]
+    by_id = {p["id"]: p for p in posts}
+    vectors = _tfidf_vectors(posts)
+
+    # Inverted index: every pair sharing a term is scored once per shared
+    # term instead of comparing all N^2 pairs of full vectors.
+    postings = defaultdict(list)
+    for post_id, vec in vectors.items():
+        for term, w in vec.items():
+            postings[term].append((post_id, w))
+
+    if changed_ids is None:
+        to_rank = set(vectors)
+    else:
+        to_rank = set(linked_ids) | set(changed_ids)
+        for post_id in changed_ids:
+            for term in vectors.get(post_id, ()):
+                to_rank.update(other_id for other_id, _ in postings[term])
+        to_rank &= set(vectors)
+
+    relations = {
+        post_id: {"related": None, "prev_post": None, "next_post": None}
+        for post_id in vectors
+    }
+    for post_id in to_rank:
+        vec = vectors[post_id]
+        scores = defaultdict(float)
+        for term, w in vec.items():
+            for other_id, other_w in postings[term]:
+                if other_id != post_id:
+                    scores[other_id] += w * other_w
+        ranked = sorted(
+            (item for item in scores.items() if item[1] >= MIN_SCORE),
+            key=lambda item: (-item[1], -item[0]),
+        )[:top_k]
+        relations[post_id]["related"] = [_link(by_id[other_id]) for other_id, _ in ranked]
+
+    by_category = defaultdict(list)
+    for post in posts:
+        by_category[post["category"]].append(post)
+    for members in by_category.values():
+        members.sort(key=lambda p: (p["created_at"] or "", p["id"]))
+        for i, post in enumerate(members):
+            if i > 0:
+                relations[post["id"]]["prev_post"] = _link(members[i - 1])
+            if i + 1 < len(members):
+                relations[post["id"]]["next_post"] = _link(members[i + 1])
+
+    return relations
+
+
+def refresh_relations(client, changed_ids=None):
+    """
+    Re-rank the posts affected by changed_ids (all posts when None) and
+    upsert only rows that changed; returns the number of rows written
+    """
+    posts = fetch_all(lambda: client.table("posts").select(POST_COLUMNS).order("id"))
+    existing = {
+        row["post_id"]: row
+        for row in fetch_all(lambda: client.table("post_relations").select("*").order("post_id"))
+    }
+
+    linked_ids = set()
+    if changed_ids is not None:
+        changed_ids = set(changed_ids)
+        # A post without a stored row has never been ranked
+        changed_ids |= {p["id"] for p in posts if p["id"] not in existing}
+        for post_id, row in existing.items():
+            if any(link["id"] in changed_ids for link in row.get("related") or []):
+                linked_ids.add(post_id)
+    relations = compute_relations(posts, changed_ids=changed_ids, linked_ids=linked_ids)
+
+    now = datetime.utcnow().isoformat()
+    changed = []
+    for post_id, rel in relations.items():
+        old = existing.get(post_id)
+        if rel["related"] is None:
+            rel["related"] = (old.get("related") or []) if old else []
+        if old and all(old.get(key) == rel[key] for key in ("related", "prev_post", "next_post")):
+            continue
+        changed.append({"post_id": post_id, **rel, "updated_at": now})
+
+    if changed:
+        client.table("post_relations").upsert(changed).execute()
+
+    # Posts moved into an excluded category keep no stale row
+    stale = [post_id for post_id in existing if post_id not in relations]
+    if stale:
+        client.table("post_relations").delete().in_("post_id", stale).execute()
+
+    return len(changed)
+
+
+_refresh_lock = threading.Lock()
+_refresh_state = {"running": False, "pending": set()}
+
+
+def schedule_refresh(client, post_ids):
+    """
+    Refresh in a background thread. Post ids from calls made while a
+    refresh is running are collected and handled in one more pass, so a
+    burst of edits costs at most two.
+    """
+    with _refresh_lock:
+        _refresh_state["pending"].update(post_ids)
+        if _refresh_state["running"]:
+            return
+        _refresh_state["running"] = True
+
+    def worker():
+        while True:
+            with _refresh_lock:
+                pending, _refresh_state["pending"] = _refresh_state["pending"], set()
+            try:
+                changed = refresh_relations(client, pending)
+                print(f"✅ Related posts refreshed ({changed} rows updated)")
+            except Exception as e:
+                print(f"❌ Related posts refresh error: {e}")
+            with _refresh_lock:
+                if not _refresh_state["pending"]:
+                    _refresh_state["running"] = False
+                    return
+
+    threading.Thread(target=worker, name="related-posts-refresh", daemon=True).start()
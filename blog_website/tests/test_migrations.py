@@ -0,0 +1,38 @@
+import glob
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import BASE_DIR, split_statements
+
+STATEMENT_START_RE = re.compile(
+    r"^(CREATE|DROP|ALTER|INSERT|UPDATE|DELETE|REVOKE|GRANT|COMMENT|SELECT|DO|SET|WITH)\b",
+    re.IGNORECASE,
+)
+
+
+def test_every_migration_statement_starts_with_a_keyword():
+    paths = sorted(glob.glob(os.path.join(BASE_DIR, "migrations", "*", "*.sql")))
+    assert paths
+    for path in paths:
+        with open(path) as f:
+            statements = split_statements(f.read())
+        assert statements, path
+        for statement in statements:
+            assert STATEMENT_START_RE.match(statement), f"{path}: {statement[:60]!r}"
+
+
+def test_split_ignores_semicolons_in_comments_and_quotes():
+    script = (
+        "-- one; two\n"
+        "CREATE TABLE t (a TEXT DEFAULT 'x;y', \"b;c\" INT); /* skip; this */\n"
+        "CREATE FUNCTION f() RETURNS INT LANGUAGE sql AS $body$ SELECT 1; $body$;\n"
+        "INSERT INTO t (a) VALUES ('it''s; fine')"
+    )
+    assert split_statements(script) == [
+        "CREATE TABLE t (a TEXT DEFAULT 'x;y', \"b;c\" INT)",
+        "CREATE FUNCTION f() RETURNS INT LANGUAGE sql AS $body$ SELECT 1; $body$",
+        "INSERT INTO t (a) VALUES ('it''s; fine')",
+    ]